@@ -1,35 +1,64 @@
 
 from typing import List
+
+__all__ = [
+    'FTPException',
+    'FTPResponseException',
+    'FTPResponseExpectationException',
+    'FTPCommandException',
+    'FTPAuthenticationException',
+]
+
 class FTPException(Exception):
     pass
 
 class FTPResponseException(FTPException):
+    __slots__ = ('code', 'messages', '_msg_joined')
+
     def __init__(self, code: str, messages: List[str]):
-        self.code = code
-        self.messages = messages
+        self.code: str = code
+        self.messages: List[str] = messages
+        self._msg_joined = None
+
+    def _get_messages_joined(self) -> str:
+        # exceptions can be stringified multiple times (logging, tracebacks), join only once
+        if self._msg_joined is None:
+            self._msg_joined = ','.join(self.messages)
+        return self._msg_joined
     
     def __str__(self):
-        return f"FTPResponseException: {self.code} {','.join(self.messages)}"
+        return "".join(("FTPResponseException: ", self.code, " ", self._get_messages_joined()))
 
 class FTPResponseExpectationException(FTPResponseException):
+    __slots__ = ('expected', '_expected_joined')
+
     def __init__(self, code: str, messages: List[str], expected: List[str]):
         super().__init__(code, messages)
         self.expected = expected
+        self._expected_joined = None
 
     def __str__(self):
-        messages = ','.join(self.messages)
-        expected = ','.join(self.expected)
-        return f"FTPResponseExpectationException: {self.code} {messages} expected {expected}"
+        if self._expected_joined is None:
+            self._expected_joined = ','.join(self.expected)
+        return "".join(("FTPResponseExpectationException: ", self.code, " ", self._get_messages_joined(), " expected ", self._expected_joined))
 
 class FTPCommandException(FTPResponseException):
+    __slots__ = ('command',)
+
     def __init__(self, command: str, code: str, messages: List[str]):
         super().__init__(code, messages)
         self.command = command
 
     def __str__(self):
-        messages = ','.join(self.messages)
-        return f"FTPCommandException: {self.command} {self.code} {messages}"
+        return "".join(("FTPCommandException: ", self.command, " ", self.code, " ", self._get_messages_joined()))
 
 class FTPAuthenticationException(FTPException):
+    __slots__ = ('code', 'messages')
+
     def __init__(self, code: str, messages: List[str]):
-        super().__init__(code, messages)
\ No newline at end of file
+        # args is already set by Exception.__new__, no need to call Exception.__init__ again
+        self.code = code
+        self.messages = messages
+
+    def __str__(self):
+        return "".join(("FTPAuthenticationException: ", self.code, " ", ','.join(self.messages)))
\ No newline at end of file
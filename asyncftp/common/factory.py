@@ -1,39 +1,83 @@
 import copy
-import ipaddress
+import asyncio
+import functools
+from typing import Iterable, List, Tuple
 from asyncftp.common.target import FTPTarget
 from asyauth.common.credentials import UniCredential
 from asyncftp.connection import FTPClientConnection
 
+_IP_CHARS = frozenset('0123456789.:abcdefABCDEF')
+
+def _is_ip_address(ip_or_hostname:str) -> bool:
+    # most hostnames contain characters that can't be in an IP address,
+    # skip the full parse (and the ValueError it raises) for those.
+    # anything with a ':' still gets parsed, scoped IPv6 addresses (fe80::1%eth0) have arbitrary characters
+    if isinstance(ip_or_hostname, str) and ':' not in ip_or_hostname and not _IP_CHARS.issuperset(ip_or_hostname):
+        return False
+    import ipaddress
+    try:
+        ipaddress.ip_address(ip_or_hostname)
+        return True
+    except (ValueError, TypeError):
+        return False
+
 class FTPConnectionFactory:
     def __init__(self, target:FTPTarget, credential:UniCredential):
         self.target = target
         self.credential = credential
 
     def get_target(self):
-        return copy.deepcopy(self.target)
+        return self.target.clone()
 
     def get_credential(self):
-        return copy.deepcopy(self.credential)
+        """
+        Returns a shallow copy of the factory's current credential.
+        The nested objects are shared between all connections of this factory, do not modify them.
+        """
+        return copy.copy(self.credential)
 
     def get_connection(self):
         return FTPClientConnection(self.get_target(), self.get_credential())
 
-    def create_connection_newtarget(self, ip_or_hostname, port:int=None):
-        credential = self.get_credential()
-        target = copy.deepcopy(self.target)
-        try:
-            ipaddress.ip_address(ip_or_hostname)
+    def __get_newtarget(self, ip_or_hostname, port:int=None):
+        target = self.target.clone()
+        if _is_ip_address(ip_or_hostname):
             target.ip = ip_or_hostname
             target.hostname = None
-        except:
+        else:
             target.hostname = ip_or_hostname
             target.ip = ip_or_hostname
         if port is not None:
             target.port = port
+        return target
+
+    def create_connection_newtarget(self, ip_or_hostname, port:int=None):
+        credential = self.get_credential()
+        target = self.__get_newtarget(ip_or_hostname, port)
         return FTPClientConnection(target, credential)
 
+    async def create_connections_newtargets(self, hosts:Iterable[str], port:int=None, connect:bool=False) -> List[Tuple[FTPClientConnection, Exception]]:
+        """
+        Create a connection for each host, sharing a single copy of the credential.
+        If connect is True, all connections are connected (and logged in) concurrently.
+        Returns a list of (connection, error) tuples in the order of hosts.
+        """
+        credential = self.get_credential()
+        connections = [FTPClientConnection(self.__get_newtarget(host, port), credential) for host in hosts]
+        if connect is False:
+            return [(connection, None) for connection in connections]
+        results = await asyncio.gather(*[connection.connect() for connection in connections])
+        return [(connection, err) for connection, (_, err) in zip(connections, results)]
+
     @staticmethod
     def from_url(url:str):
-        target = FTPTarget.from_url(url)
-        credential = UniCredential.from_url(url)
-        return FTPConnectionFactory(target, credential)
+        # the templates are shared between factories created from the same url,
+        # the cached objects are shared, each factory gets its own copies
+        target, credential = _factory_template_from_url(url)
+        return FTPConnectionFactory(target.clone(), copy.deepcopy(credential))
+
+@functools.lru_cache(maxsize=64)
+def _factory_template_from_url(url:str):
+    target = FTPTarget.from_url(url)
+    credential = UniCredential.from_url(url)
+    return target, credential
@@ -0,0 +1,198 @@
+import asyncio
+import collections
+import contextlib
+from typing import Tuple, Awaitable, Iterable, List, AsyncGenerator
+from asyncftp.common.factory import FTPConnectionFactory
+from asyncftp.connection import FTPClientConnection
+from asyncftp.common.exceptions import FTPException
+
+class FTPConnectionPool:
+    def __init__(self, factory: FTPConnectionFactory, max_size: int = 8):
+        self.factory = factory
+        self.max_size = max_size
+        self.__idle = collections.deque()
+        # guards __idle and __size, notified whenever a connection or a free slot becomes available
+        self.__cond = asyncio.Condition()
+        self.__size = 0
+        self.__closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    async def __free_slot(self):
+        # the count is decreased before waiting for the lock,
+        # so the slot is given back even if the notification can't be sent
+        self.__size -= 1
+        async with self.__cond:
+            self.__cond.notify()
+
+    async def acquire(self) -> Awaitable[Tuple[FTPClientConnection, Exception]]:
+        """
+        Get a logged in connection from the pool.
+        A new connection is created if there is no idle one and the pool is not full,
+        otherwise waits until a connection is released.
+        Returns a tuple of (connection, error).
+        """
+        dead = []
+        try:
+            try:
+                async with self.__cond:
+                    while True:
+                        if self.__closed is True:
+                            raise FTPException("Connection pool is closed")
+                        if len(self.__idle) > 0:
+                            connection = self.__idle.popleft()
+                            if connection.is_alive():
+                                return connection, None
+                            # the server dropped this one, its slot can be reused right away
+                            self.__size -= 1
+                            dead.append(connection)
+                            continue
+                        if self.__size < self.max_size:
+                            # reserve the slot, the connection is made without holding the lock
+                            self.__size += 1
+                            break
+                        await self.__cond.wait()
+            finally:
+                # closed outside the lock, the slots were already given back
+                for connection in dead:
+                    await connection.disconnect()
+
+            connected = False
+            try:
+                connection = self.factory.get_connection()
+                _, err = await connection.connect()
+                if err is not None:
+                    raise err
+                connected = True
+                return connection, None
+            finally:
+                if connected is False:
+                    await self.__free_slot()
+        except Exception as e:
+            return None, e
+
+    async def release(self, connection: FTPClientConnection, discard: bool = False):
+        """
+        Return a connection to the pool.
+        Dead connections and connections released after the pool was closed are disconnected.
+        discard: disconnect the connection instead of pooling it. Use this if an operation on it failed,
+        the control channel might have unread replies left on it.
+        """
+        if discard is False and self.__closed is False and connection.is_alive():
+            async with self.__cond:
+                self.__idle.append(connection)
+                self.__cond.notify()
+            return
+        await self.__free_slot()
+        await connection.disconnect()
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        """
+        Context manager wrapping acquire and release.
+        Raises the error if no connection could be obtained.
+        If the block raises, the connection is discarded instead of returned to the pool.
+        """
+        connection, err = await self.acquire()
+        if err is not None:
+            raise err
+        try:
+            yield connection
+        except BaseException:
+            await self.release(connection, discard=True)
+            raise
+        await self.release(connection)
+
+    async def size_many(self, paths: Iterable[str]) -> Awaitable[List[Tuple[int, Exception]]]:
+        """
+        Get the size of multiple files concurrently, spread over the pooled connections.
+        Returns a list of (size, error) tuples in the order of paths.
+        """
+        async def size_one(path):
+            connection, err = await self.acquire()
+            if err is not None:
+                return None, err
+            # also discarded if cancelled halfway through the command
+            failed = True
+            try:
+                size, err = await connection.size(path)
+                failed = err is not None
+                return size, err
+            finally:
+                await self.release(connection, discard=failed)
+
+        return await asyncio.gather(*[size_one(path) for path in paths])
+
+    async def enum_all(self, path: str = '', depth: int = 3, filter_cb = None, workers: int = None) -> AsyncGenerator[Tuple[dict, Exception], None]:
+        """
+        Enumerate all files and directories on the FTP server, like FTPClientConnection.enum_all
+        but listing directories concurrently over the pooled connections.
+        At most workers (default: max_size) MLSD commands run at the same time,
+        the entries of a directory are returned as soon as its listing finished.
+        The order of the results differs from the serial version.
+        Returns a generator of (entry, error).
+        """
+        semaphore = asyncio.Semaphore(workers if workers is not None else self.max_size)
+
+        async def list_dir(dirpath, dirdepth):
+            try:
+                async with semaphore:
+                    connection, err = await self.acquire()
+                    if err is not None:
+                        raise err
+                    # a listing that failed halfway can leave its final reply unread,
+                    # such a connection is not given to the next user
+                    failed = True
+                    try:
+                        entries = [(entry, err) async for _, entry, err in connection.mlsd(dirpath)]
+                        failed = any(err is not None for _, err in entries)
+                        return dirdepth, entries
+                    finally:
+                        await self.release(connection, discard=failed)
+            except Exception as e:
+                return dirdepth, [(None, e)]
+
+        pending = {asyncio.create_task(list_dir(path, depth))}
+        try:
+            while len(pending) > 0:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    dirdepth, entries = task.result()
+                    for entry, err in entries:
+                        if err is not None:
+                            yield entry, err
+                            continue
+
+                        if filter_cb is not None:
+                            res = await filter_cb(entry['type'], entry)
+                            if res is False:
+                                continue
+
+                        yield entry, None
+
+                        if entry['type'] == 'dir' and dirdepth > 0:
+                            pending.add(asyncio.create_task(list_dir(entry['fullpath'], dirdepth - 1)))
+        finally:
+            # listings already started are let to finish, cancelling them
+            # would put connections with an unfinished transfer back into the pool
+            if len(pending) > 0:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def aclose(self):
+        """
+        Close all idle connections.
+        Connections in use are closed when they are released.
+        """
+        async with self.__cond:
+            self.__closed = True
+            idle = list(self.__idle)
+            self.__idle.clear()
+            self.__size -= len(idle)
+            # waiters see the pool is closed and give up
+            self.__cond.notify_all()
+        for connection in idle:
+            await connection.disconnect()
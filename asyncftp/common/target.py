@@ -1,48 +1,55 @@
 import copy
-from urllib.parse import urlparse, parse_qs
+import types
+import functools
+from urllib.parse import urlsplit
 from typing import List
 from asysocks.unicomm.utils.paramprocessor import str_one, int_one, bool_one
 
 from asysocks.unicomm.common.target import UniTarget, UniProto
 from asysocks.unicomm.common.proxy import UniProxyProto, UniProxyTarget
 
-ftp_target_url_params = {
+ftp_target_url_params = types.MappingProxyType({
 	'passive' : bool_one,
-}
+})
 
 class FTPTarget(UniTarget):
+    __slots__ = ('passive',)
+
     def __init__(self, ip: str, port: int = 21, protocol: UniProto = UniProto.CLIENT_TCP, timeout: int = 10, hostname: str = None, proxies: List[UniProxyTarget] = None, domain: str = None, dc_ip: str = None, dns: str = None, passive: bool = True):
         UniTarget.__init__(self, ip, port, protocol, timeout, hostname = hostname, proxies = proxies, domain = domain, dc_ip = dc_ip, dns=dns)
         self.passive: bool = passive
 
+    def clone(self):
+        # cheaper than deepcopy, only the proxy objects get mutated by UniTarget
+        target = copy.copy(self)
+        target.proxies = [copy.copy(proxy) for proxy in self.proxies]
+        return target
+
+    def __str__(self):
+        # passive lives in a slot, UniTarget only prints __dict__
+        return UniTarget.__str__(self) + 'passive: %s\r\n' % self.passive
+
+    @classmethod
+    def _from_unitarget(cls, unitarget:UniTarget, passive:bool):
+        # takes over the already initialized fields instead of running __init__ again
+        target = cls.__new__(cls)
+        target.__dict__.update(unitarget.__dict__)
+        target.passive = passive
+        return target
+
     @staticmethod
     def from_url(url:str):
-        url_e = urlparse(url)
-        schemes = url_e.scheme.upper().split('+')
-
-        # TODO: add proper protocol support
-        # ftp+ssl://
-        ftpproto = 'FTP'
-        if len(schemes) == 2 and schemes[0] == 'FTP' and schemes[1] == 'SSL':
-            ftpproto = 'FTPS'
-        # ftp://
-        elif len(schemes) == 1 and schemes[0] == 'FTP':
-            ftpproto = 'FTP'
-
-        port = 21
-        if url_e.port:
-            port = url_e.port
-
-        unitarget, extraparams = UniTarget.from_url(url, UniProto.CLIENT_TCP, port, ftp_target_url_params)
-        target = FTPTarget(
-            ip = unitarget.ip,
-            port = unitarget.port,
-            protocol = unitarget.protocol,
-            timeout = unitarget.timeout,
-            hostname = unitarget.hostname,
-            proxies = unitarget.proxies,
-            domain = unitarget.domain,
-            dc_ip = unitarget.dc_ip,
-            dns = unitarget.dns,
-            passive = extraparams.get('passive', True))
-        return target
+        return _from_url_cached(url).clone()
+
+@functools.lru_cache(maxsize=128)
+def _from_url_cached(url:str):
+    # the parsed target is cached per url string,
+    # it must not be handed out without clone()
+    url_e = urlsplit(url)
+    # TODO: add proper protocol support, the scheme (ftp:// or ftp+ssl://) is not used yet
+    port = 21
+    if url_e.port:
+        port = url_e.port
+
+    unitarget, extraparams = UniTarget.from_url(url, UniProto.CLIENT_TCP, port, ftp_target_url_params)
+    return FTPTarget._from_unitarget(unitarget, extraparams.get('passive', True))
@@ -1,12 +1,16 @@
 import asyncio
+import collections
+import contextlib
+import types
 import traceback
 import re
 import copy
 import io
 import os
-from pathlib import Path
+import socket
+import posixpath
 import datetime
-from typing import List, Tuple, Awaitable, Coroutine, Any, AsyncGenerator
+from typing import List, Tuple, Dict, Awaitable, Coroutine, Any, AsyncGenerator
 from asyncftp.common.target import FTPTarget
 from asyauth.common.credentials import UniCredential
 from asyauth.common.constants import asyauthSecret
@@ -16,6 +20,28 @@ from asysocks.unicomm.common.packetizers import Packetizer
 from asyncftp.common.exceptions import FTPException, FTPResponseException, \
     FTPResponseExpectationException, FTPCommandException, FTPAuthenticationException
 
+_CRLF = b"\r\n"
+
+# commands without arguments
+_CMD_USER_ANONYMOUS = b"USER anonymous\r\n"
+_CMD_PASS_ANONYMOUS = b"PASS anonymous@\r\n"
+_CMD_LIST = b"LIST\r\n"
+_CMD_FEAT = b"FEAT\r\n"
+_CMD_SYST = b"SYST\r\n"
+_CMD_HELP = b"HELP\r\n"
+_CMD_STAT = b"STAT\r\n"
+_CMD_CDUP = b"CDUP\r\n"
+_CMD_PWD = b"PWD\r\n"
+_CMD_PASV = b"PASV\r\n"
+_CMD_MLSD = b"MLSD\r\n"
+_CMD_NOOP = b"NOOP\r\n"
+_CMD_ACCT = b"ACCT\r\n"
+_CMD_QUIT = b"QUIT\r\n"
+
+_PWD_PATH_RE = re.compile(r'"(.*?)"')
+_CWD_REPLY_RE = re.compile(r'"((?:[^"]|"")*)" is ')
+_PASV_RE = re.compile(r'\(([^)]*)\)')
+
 class FTPResponse:
     def __init__(self, code: str, messages: List[str]):
         self.code = code
@@ -38,41 +64,92 @@ class FTPResponse:
             return self.code
         if len(self.messages) == 1:
             return f"{self.code} {self.messages[0]}"
-        if len(self.messages) > 1:
-            res = []
-            res.append(self.code + "-" + self.messages[0])
-            for m in self.messages[1:-1]:
-                res.append(m)
-            res.append(self.code + " " + self.messages[-1])
-            return "\r\n".join(res)
+        first = f"{self.code}-{self.messages[0]}"
+        last = f"{self.code} {self.messages[-1]}"
+        return "\r\n".join((first, *self.messages[1:-1], last))
+
+def _has_fileno(data) -> bool:
+    try:
+        data.fileno()
+        return True
+    except (AttributeError, OSError, ValueError):
+        # BytesIO and friends raise io.UnsupportedOperation
+        return False
+
+# flags for files written with os.write, O_BINARY only exists on windows
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+_APPEND_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, 'O_BINARY', 0)
+
+def _write_chunks(fd: int, chunks: List[bytes]):
+    # one syscall for the whole batch (unless the OS does a partial write)
+    data = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+_TCP_NODELAY = getattr(socket, 'TCP_NODELAY', None)
+
+def _set_tcp_option(writer, option: int, value: int):
+    # best effort, proxy links and the browser build might not have a real socket
+    if option is None:
+        return
+    get_extra_info = getattr(writer, 'get_extra_info', None)
+    if get_extra_info is None:
+        return
+    sock = get_extra_info('socket')
+    if sock is None:
+        return
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, option, value)
+    except OSError:
+        pass
+
+def _parse_ftp_ts(s: str) -> datetime.datetime:
+    # YYYYMMDDHHMMSS[.sss], fixed width so slicing is enough
+    return datetime.datetime(int(s[0:4]), int(s[4:6]), int(s[6:8]), int(s[8:10]), int(s[10:12]), int(s[12:14]))
 
 def parse_mlsd_line(line: str, basepath: str = ''):
-    entry = {}
-    line = line.strip()
-    parts, fname = line.split("; ")
-    entry['name'] = fname
-    entry['fullpath'] = os.path.join(basepath, fname) # TODO: check if this is correct bc windows might not like it
-    entry['size'] = 0
-    parts = parts.split(";")
-    for part in parts:
-        key, value = part.split("=")
-        if key == 'modify':
-            value = datetime.datetime.strptime(value, "%Y%m%d%H%M%S")
-        elif key == 'size':
-            value = int(value)
-        entry[key] = value
+    facts, sep, fname = line.strip().partition("; ")
+    if sep == '':
+        raise FTPException("Invalid MLSD line: %s" % line)
+    # ftp paths are always separated by forward slashes
+    if basepath == '':
+        fullpath = fname
+    elif basepath[-1] == '/':
+        fullpath = basepath + fname
+    else:
+        fullpath = basepath + '/' + fname
+    entry = {'name': fname, 'fullpath': fullpath, 'size': 0}
+    entry.update(part.split("=", 1) for part in facts.split(";") if part)
+    if 'modify' in entry:
+        entry['modify'] = _parse_ftp_ts(entry['modify'])
+    entry['size'] = int(entry['size'])
     return entry
 
 
 class FTPClientConnection:
-    def __init__(self, target: FTPTarget, credential: UniCredential):
+    def __init__(self, target: FTPTarget, credential: UniCredential, data_read_size: int = 262144, file_buffer_size: int = 1 << 20):
         self.target = target
         self.credential = credential
+        # read size of the data channel socket
+        self.data_read_size = data_read_size
+        # downloaded data is collected up to this size before it is written to disk
+        self.file_buffer_size = file_buffer_size
         self.connection_closed_evt = asyncio.Event()
         self.network_connection = None
+        self.__line_reader = None
+        # reply lines already read from the network but not yet consumed
+        self.__pending_lines = collections.deque()
         self.banner = []
         self.encoding = 'utf-8'
         self.__lock = asyncio.Lock()
+        # last TYPE the server accepted, None if unknown
+        self.__current_type = None
+        # FEAT and SYST replies don't change during a session, cached until reconnect
+        self.__feat_cache = None
+        self.__syst_cache = None
+        # current directory as reported by the server, None if unknown
+        self.__cwd = None
 
     async def __aenter__(self):
         await self.connect()
@@ -83,36 +160,68 @@ class FTPClientConnection:
 
     async def __read_data_channel(self, line_based: bool = False):
         data_connection = None
-        buffer = b''
+        buffer = bytearray()
         try:
             if self.target.passive is False:
                 raise Exception("Active mode not supported")
             target, err = await self.__pasv()
             if err is not None:
                 raise err
-            client = UniClient(target, Packetizer())
+            client = UniClient(target, Packetizer(self.data_read_size))
             data_connection = await client.connect()
             async for data in data_connection.read():
                 if line_based is True:
-                    buffer += data
-                    while True:
-                        m = buffer.find(b"\n")
-                        if m == -1:
-                            break
-                        temp = buffer[:m]
-                        buffer = buffer[m+1:]
-                        yield temp, None
-                        
+                    buffer.extend(data)
+                    # split all complete lines at once, keep the partial line for the next chunk
+                    end = buffer.rfind(b"\n")
+                    if end == -1:
+                        continue
+                    lines = buffer[:end].split(b"\n")
+                    del buffer[:end + 1]
+                    for line in lines:
+                        yield bytes(line), None
+
                 else:
                     yield data, None
-        
+            if line_based is True and len(buffer) > 0:
+                # last line without a line terminator
+                yield bytes(buffer), None
+
         except Exception as e:
             yield None, e
         finally:
             if data_connection is not None:
                 await data_connection.close()
 
-    async def __write_data_channel(self, data: io.BytesIO, chunksize: int = 102400):
+    async def __read_data_channel_to_fd(self, fd: int) -> Coroutine[Any, Any, Tuple[int, Exception]]:
+        """
+        Write everything read from the data channel to a file descriptor.
+        The data is collected up to file_buffer_size and written with a single os.write.
+        Returns a tuple of (bytes_written, error).
+        """
+        try:
+            total = 0
+            chunks = []
+            pending = 0
+            async for data, err in self.__read_data_channel(line_based=False):
+                if err is not None:
+                    raise err
+                chunks.append(data)
+                pending += len(data)
+                if pending >= self.file_buffer_size:
+                    _write_chunks(fd, chunks)
+                    total += pending
+                    chunks.clear()
+                    pending = 0
+            if len(chunks) > 0:
+                _write_chunks(fd, chunks)
+                total += pending
+            return total, None
+        except Exception as e:
+            return None, e
+
+    async def __write_data_channel(self, data: io.BytesIO, chunksize: int = 1 << 20):
+        # yields (bytes_sent, None) after each chunk, (None, error) on failure
         data_connection = None
         try:
             if self.target.passive is False:
@@ -122,11 +231,26 @@ class FTPClientConnection:
                 raise err
             client = UniClient(target, Packetizer())
             data_connection = await client.connect()
+            transport = getattr(data_connection.writer, 'transport', None)
+            if transport is not None and type(data_connection.packetizer) is Packetizer and _has_fileno(data):
+                # real files are handed to the kernel (sendfile) when the transport supports it,
+                # asyncio falls back to a read/write loop otherwise.
+                # never for TLS wrapped data channels, the packetizer must see the plaintext
+                try:
+                    sent = await asyncio.get_running_loop().sendfile(transport, data)
+                except NotImplementedError:
+                    # loops not based on asyncio's (uvloop) don't implement sendfile at all,
+                    # nothing was sent yet, the chunked loop below takes over
+                    pass
+                else:
+                    yield sent, None
+                    return
             while True:
                 chunk = data.read(chunksize)
                 if len(chunk) == 0:
                     break
                 await data_connection.write(chunk)
+                yield len(chunk), None
         except Exception as e:
             yield None, e
         finally:
@@ -144,10 +268,19 @@ class FTPClientConnection:
             rcode = None
             response = []
             while True:
-                res = await self.network_connection.read_one()
-                if res is None:
-                    break
-                line = res
+                # the reader hands over all lines of a network read at once,
+                # it is only awaited when every buffered line has been consumed
+                if len(self.__pending_lines) == 0:
+                    try:
+                        lines = await self.__line_reader.__anext__()
+                    except StopAsyncIteration:
+                        lines = None
+                    if lines is None:
+                        # EOF or a read error (the reader swallows those), the connection is gone
+                        self.connection_closed_evt.set()
+                        break
+                    self.__pending_lines.extend(lines)
+                line = self.__pending_lines.popleft()
                 if rcode is None:
                     to_continue = line[3] == '-'
                     rcode = line[:3]
@@ -165,18 +298,69 @@ class FTPClientConnection:
         except Exception as e:
             return None, e
 
-    def connection_lock_asynciter(func):
-        async def wrapper(self, *args, **kwargs):
-            async with self.__lock:
-                async for result in func(self, *args, **kwargs):
-                    yield result
-        return wrapper
+    async def __write(self, data: bytes):
+        """
+        Write to the control connection.
+        If the write fails the connection is marked as closed, it can't be used anymore.
+        """
+        try:
+            await self.network_connection.write(data)
+        except Exception:
+            self.connection_closed_evt.set()
+            raise
+
+    async def __write_pipelined(self, cmds: List[bytes]):
+        """
+        Send multiple command lines in a single write.
+        The caller must read one response for each command, in order.
+        """
+        writer = self.network_connection.writer
+        writelines = getattr(writer, 'writelines', None)
+        if writelines is not None and type(self.network_connection.packetizer) is FTPPacketizer:
+            # plain connection, the packetizer would pass the data through unchanged.
+            # writelines lets the transport send all lines with one vectored write (sendmsg)
+            try:
+                writelines(cmds)
+                await writer.drain()
+            except Exception:
+                self.connection_closed_evt.set()
+                raise
+        else:
+            # TLS needs the packetizer to encrypt the data, wsnet proxy writers have no writelines
+            await self.__write(b"".join(cmds))
+
+    async def __simple_cmd(self, cmd: bytes, expect: List[str], arg: str = None) -> Coroutine[Any, Any, Tuple[FTPResponse, Exception]]:
+        """
+        Send a single command and check the response code.
+        If arg is set, cmd is the command prefix and the encoded argument is appended to it.
+        Returns a tuple of (response, error).
+        """
+        try:
+            if arg is not None:
+                cmd = b"".join((cmd, arg.encode(self.encoding), _CRLF))
+            await self.__write(cmd)
+            response, err = await self.__read_response()
+            if err is not None:
+                raise err
+            response.expect(expect)
+            return response, None
+        except Exception as e:
+            return None, e
 
-    def connection_lock(func):
-        async def wrapper(self, *args, **kwargs):
-            async with self.__lock:
-                return await func(self, *args, **kwargs)
-        return wrapper
+    @contextlib.asynccontextmanager
+    async def batch(self):
+        """
+        Hold the connection lock for a sequence of commands, so no other task can interleave its own.
+        Yields an object with lock-free versions of size, type, get_file and stor_stream.
+        Only use those inside the with block, calling the regular methods of the connection there deadlocks.
+        """
+        async with self.__lock:
+            yield types.SimpleNamespace(
+                size = self.__size,
+                type = self.__type,
+                get_file = self.__get_file,
+                stor_stream = self.__stor_stream,
+            )
 
     async def connect(self, nologin: bool = False) -> Awaitable[Tuple[bool, Exception]]:
         """
@@ -188,20 +372,27 @@ class FTPClientConnection:
             packetizer = FTPPacketizer()
             client = UniClient(self.target, packetizer)
             self.network_connection = await client.connect()
-            response = None
-            for _ in range(255):
-                # read the response
+            # commands are tiny, don't let Nagle hold them back waiting for ACKs
+            _set_tcp_option(self.network_connection.writer, _TCP_NODELAY, 1)
+            self.__line_reader = self.network_connection.read()
+            self.__pending_lines.clear()
+            self.__current_type = None
+            self.__feat_cache = None
+            self.__syst_cache = None
+            self.__cwd = None
+            while True:
+                # multi-line greetings are handled by __read_response,
+                # only a 1xx preliminary reply (e.g. 120) is followed by another one
                 response, err = await self.__read_response()
                 if err is not None:
                     raise err
-                if response.more_messages():
-                    continue
-                if response.expect(["220", "230", "232"]):
-                    if response.code == "220":
-                        self.banner = response.messages
+                if response.code is None:
+                    raise FTPException("No response from server")
+                if response.more_messages() is False:
                     break
-            if response is None:
-                raise FTPException("No response from server")
+            response.expect(["220", "230", "232"])
+            if response.code == "220":
+                self.banner = response.messages
             if nologin is True:
                 return True, None
             if response.code in ["230", "232"]:
@@ -219,14 +410,29 @@ class FTPClientConnection:
         Call this when you are done with the connection.
         """
         if self.network_connection is not None:
-            try:
-                await self.__quit()
-            except Exception as e:
-                pass
+            # no point in saying goodbye on a connection that is already gone
+            if self.connection_closed_evt.is_set() is False:
+                try:
+                    await self.__quit()
+                except Exception as e:
+                    pass
             await self.network_connection.close()
             self.network_connection = None
+            self.__line_reader = None
+            self.__pending_lines.clear()
             self.connection_closed_evt.set()
 
+    def is_alive(self) -> bool:
+        """
+        Returns True if the control connection is still open.
+        A connection closed by the server is only noticed by the next read or write on it.
+        """
+        if self.network_connection is None:
+            return False
+        if self.connection_closed_evt.is_set():
+            return False
+        return self.network_connection.closing is False
+
     async def login(self) -> Coroutine[Any, Any, Tuple[bool, Exception]]:
         """
         Login to the FTP server. Only call this if you called connect with nologin=False.
@@ -234,13 +440,13 @@ class FTPClientConnection:
         """
         try:
             if self.credential.stype == asyauthSecret.NONE:
-                await self.network_connection.write(b"USER anonymous\r\n")
+                await self.__write(_CMD_USER_ANONYMOUS)
                 response, err = await self.__read_response()
                 if err is not None:
                     raise err
                 response.expect(["331", "332"])
                 if response.code == "331":
-                    await self.network_connection.write(b"PASS anonymous@\r\n")
+                    await self.__write(_CMD_PASS_ANONYMOUS)
                     response, err = await self.__read_response()
                     if err is not None:
                         raise err
@@ -263,8 +469,8 @@ class FTPClientConnection:
         Returns a tuple of (success, error).
         """
         try:
-            await self.network_connection.write(b"USER anonymous\r\n")
-            await self.network_connection.write(b"PASS anonymous@\r\n")
+            await self.__write(_CMD_USER_ANONYMOUS)
+            await self.__write(_CMD_PASS_ANONYMOUS)
         except Exception as e:
             return False, e
 
@@ -274,161 +480,184 @@ class FTPClientConnection:
         Returns a tuple of (success, error).
         """
         try:
-            await self.network_connection.write(b"USER %s\r\n" % self.credential.username.encode())
+            await self.__write(b"".join((b"USER ", self.credential.username.encode(), _CRLF)))
             response, err = await self.__read_response()
             if err is not None:
                 raise err
             response.expect(["331", "332"])
-            if response.code == "331":
-                await self.network_connection.write(b"PASS %s\r\n" % self.credential.secret.encode())
-                response, err = await self.__read_response()
-                if err is not None:
-                    raise err
-                if response.code == "230":
-                    return True, None
-                else:
-                    return False, FTPAuthenticationException(response.code, response.messages)
-            else:
-                return False, FTPAuthenticationException(response.code, response.messages)
+            if response.code != "331":
+                # 332, account is needed which is not supported
+                raise FTPAuthenticationException(response.code, response.messages)
+            await self.__write(b"".join((b"PASS ", self.credential.secret.encode(), _CRLF)))
+            response, err = await self.__read_response()
+            if err is not None:
+                raise err
+            if response.code != "230":
+                raise FTPAuthenticationException(response.code, response.messages)
+            return True, None
         except Exception as e:
             return False, e
-        return True, None
 
-    @connection_lock_asynciter
     async def list(self, path: str = '') -> AsyncGenerator[Tuple[str, Exception], None]:
         """
         List the contents of a directory on the FTP server.
         Returns a generator of (data, error).
         """
-        try:
-            if path == '':
-                await self.network_connection.write(b"LIST\r\n")
-            else:
-                await self.network_connection.write(b"LIST %s\r\n" % path.encode())
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["150"])
-            async for data, err in self.__read_data_channel(line_based=True):
+        async with self.__lock:
+            try:
+                if path == '':
+                    await self.__write(_CMD_LIST)
+                else:
+                    await self.__write(b"".join((b"LIST ", path.encode(self.encoding), _CRLF)))
+                response, err = await self.__read_response()
                 if err is not None:
                     raise err
-                yield data.decode(self.encoding), None
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["226"])
-        except Exception as e:
-            yield None, e
+                response.expect(["150"])
+                async for data, err in self.__read_data_channel(line_based=True):
+                    if err is not None:
+                        raise err
+                    yield data.decode(self.encoding), None
+                response, err = await self.__read_response()
+                if err is not None:
+                    raise err
+                response.expect(["226"])
+            except Exception as e:
+                yield None, e
         
-    @connection_lock_asynciter
     async def feat(self) -> AsyncGenerator[Tuple[str, Exception], None]:
         """
         Get the features of the FTP server.
         Returns a generator of features.
         """
-        try:
-            await self.network_connection.write(b"FEAT\r\n")
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["211", "214"])
-            for feat in response.messages:
-                yield feat, None
-        except Exception as e:
-            yield None, e
+        async with self.__lock:
+            try:
+                if self.__feat_cache is None:
+                    await self.__write(_CMD_FEAT)
+                    response, err = await self.__read_response()
+                    if err is not None:
+                        raise err
+                    response.expect(["211", "214"])
+                    self.__feat_cache = response.messages
+                for feat in self.__feat_cache:
+                    yield feat, None
+            except Exception as e:
+                yield None, e
+
+    async def syst(self) -> AsyncGenerator[Tuple[str, Exception], None]:
+        """
+        Get the system type of the FTP server.
+        Returns a generator of system type messages.
+        """
+        async with self.__lock:
+            try:
+                if self.__syst_cache is None:
+                    await self.__write(_CMD_SYST)
+                    response, err = await self.__read_response()
+                    if err is not None:
+                        raise err
+                    response.expect(["215"])
+                    self.__syst_cache = response.messages
+                for syst in self.__syst_cache:
+                    yield syst, None
+            except Exception as e:
+                yield None, e
 
-    @connection_lock_asynciter
     async def help(self, command: str = '') -> AsyncGenerator[Tuple[str, Exception], None]:
         """
         Get the help of the FTP server.
         Returns a generator of help messages.
         """
-        try:
-            if command == '':
-                await self.network_connection.write(b"HELP\r\n")
-            else:
-                await self.network_connection.write(b"HELP %s\r\n" % command.encode())
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["214", "226"])
-            for help in response.messages:
-                yield help, None
-        except Exception as e:
-            yield None, e
+        async with self.__lock:
+            try:
+                if command == '':
+                    await self.__write(_CMD_HELP)
+                else:
+                    await self.__write(b"".join((b"HELP ", command.encode(self.encoding), _CRLF)))
+                response, err = await self.__read_response()
+                if err is not None:
+                    raise err
+                response.expect(["214", "226"])
+                for help in response.messages:
+                    yield help, None
+            except Exception as e:
+                yield None, e
 
-    @connection_lock_asynciter
     async def stat(self) -> AsyncGenerator[Tuple[str, Exception], None]:
         """
         Get the status of the FTP server.
         Returns a generator of status messages.
         """
-        try:
-            await self.network_connection.write(b"STAT\r\n")
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["211"])
-            for stat in response.messages:
-                yield stat, None
-        except Exception as e:
-            yield None, e
+        async with self.__lock:
+            try:
+                await self.__write(_CMD_STAT)
+                response, err = await self.__read_response()
+                if err is not None:
+                    raise err
+                response.expect(["211"])
+                for stat in response.messages:
+                    yield stat, None
+            except Exception as e:
+                yield None, e
 
-    @connection_lock
     async def cwd(self, path: str) -> Coroutine[Any, Any, Tuple[bool, Exception]]:
         """
         Change the working directory of the FTP server.
         Returns a tuple of (success, error).
         """
-        try:
-            await self.network_connection.write(b"CWD %s\r\n" % path.encode())
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["250"])
-            return True, None
-        except Exception as e:
-            return False, e
+        async with self.__lock:
+            response, err = await self.__simple_cmd(b"CWD ", ["250"], path)
+            self.__update_cwd(response)
+            return err is None, err
 
-    @connection_lock
     async def cdup(self) -> Coroutine[Any, Any, Tuple[bool, Exception]]:
         """
         Change the working directory of the FTP server to the parent directory.
         Returns a tuple of (success, error).
         """
-        try:
-            await self.network_connection.write(b"CDUP\r\n")
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["200", "250"])
-            return True, None
-        except Exception as e:
-            return False, e
+        async with self.__lock:
+            response, err = await self.__simple_cmd(_CMD_CDUP, ["200", "250"])
+            self.__update_cwd(response)
+            return err is None, err
+
+    def __update_cwd(self, response: FTPResponse):
+        # many servers reply to CWD/CDUP with '250 "<path>" is the current directory',
+        # only that exact form is trusted. Multi-line replies carry banners
+        # (e.g. .message files) with quoted text that is not a path.
+        # if it doesn't match, the next pwd call asks the server
+        self.__cwd = None
+        if response is None or len(response.messages) != 1:
+            return
+        path_match = _CWD_REPLY_RE.match(response.messages[0])
+        if path_match is not None:
+            # quotes inside the path are doubled (RFC 959)
+            self.__cwd = path_match.group(1).replace('""', '"')
 
-    @connection_lock
     async def pwd(self) -> Coroutine[Any, Any, Tuple[str, Exception]]:
         """
         Get the current working directory of the FTP server.
         Returns a tuple of (directory_path, error).
         """
-        try:
-            await self.network_connection.write(b"PWD\r\n")
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["257"])
-            
-            # Extract the path from the response
-            # The path is typically enclosed in quotes
-            path_match = re.search(r'"(.*?)"', response.messages[0])
-            if path_match:
-                return path_match.group(1), None
-            else:
-                # Fallback if quotes aren't found
-                return response.messages[0], None
-        except Exception as e:
-            return None, e
+        async with self.__lock:
+            try:
+                if self.__cwd is not None:
+                    return self.__cwd, None
+                await self.__write(_CMD_PWD)
+                response, err = await self.__read_response()
+                if err is not None:
+                    raise err
+                response.expect(["257"])
+
+                # Extract the path from the response
+                # The path is typically enclosed in quotes
+                path_match = _PWD_PATH_RE.search(response.messages[0])
+                if path_match:
+                    self.__cwd = path_match.group(1)
+                    return self.__cwd, None
+                else:
+                    # Fallback if quotes aren't found
+                    return response.messages[0], None
+            except Exception as e:
+                return None, e
     
     
     async def __size(self, path: str) -> Coroutine[Any, Any, Tuple[int, Exception]]:
@@ -437,8 +666,9 @@ class FTPClientConnection:
         Returns a tuple of (success, error).
         """
         try:
-            await self.__type("I")
-            await self.network_connection.write(b"SIZE %s\r\n" % path.encode())
+            if self.__current_type != "I":
+                await self.__type("I")
+            await self.__write(b"".join((b"SIZE ", path.encode(self.encoding), _CRLF)))
             response, err = await self.__read_response()
             if err is not None:
                 raise err
@@ -447,13 +677,13 @@ class FTPClientConnection:
         except Exception as e:
             return None, e
 
-    @connection_lock
     async def size(self, path: str) -> Coroutine[Any, Any, Tuple[int, Exception]]:
         """
         Get the size of a file on the FTP server.
         Returns a tuple of (success, error).
         """
-        return await self.__size(path)
+        async with self.__lock:
+            return await self.__size(path)
 
     async def __type(self, type: str) -> Coroutine[Any, Any, Tuple[bool, Exception]]:
         """
@@ -461,24 +691,19 @@ class FTPClientConnection:
         type: A, I, E, L for ASCII, Image, EBCDIC, Local
         Returns a tuple of (success, error).
         """
-        try:
-            await self.network_connection.write(b"TYPE %s\r\n" % type.encode())
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["200"])
-            return True, None
-        except Exception as e:
-            return False, e
+        _, err = await self.__simple_cmd(b"TYPE ", ["200"], type)
+        if err is None:
+            self.__current_type = type
+        return err is None, err
 
-    @connection_lock
     async def type(self, type: str) -> Coroutine[Any, Any, Tuple[bool, Exception]]:
         """
         Set the type of the data connection.
         type: A, I, E, L for ASCII, Image, EBCDIC, Local
         Returns a tuple of (success, error).
         """
-        return await self.__type(type)
+        async with self.__lock:
+            return await self.__type(type)
 
     async def __pasv(self) -> Coroutine[Any, Any, Tuple[FTPTarget, Exception]]:
         """
@@ -486,48 +711,53 @@ class FTPClientConnection:
         Returns a tuple of (target, error).
         """
         try:
-            await self.network_connection.write(b"PASV\r\n")
+            await self.__write(_CMD_PASV)
             response, err = await self.__read_response()
             if err is not None:
                 raise err
             response.expect(["227"])
             # regex to extract the port from the response
-            passive_def = re.search(r'\((.*?)\)', response.messages[0]).group(1)
-            if passive_def is None:
+            passive_match = _PASV_RE.search(response.messages[0])
+            if passive_match is None:
                 raise FTPCommandException("PASV", response.code, response.messages)
-            passive_ip = '.'.join(passive_def.split(",")[:4])
-            passive_port = int(passive_def.split(",")[4]) * 256 + int(passive_def.split(",")[5])
-            return FTPTarget(ip=passive_ip, port=passive_port, proxies=copy.deepcopy(self.target.proxies)), None
+            passive_def = passive_match.group(1)
+            parts = passive_def.split(",")
+            passive_ip = '.'.join(parts[:4])
+            passive_port = (int(parts[4]) << 8) | int(parts[5])
+            # UniTarget rewrites the endpoint of the last proxy, so copy the entries but not their contents
+            proxies = [copy.copy(proxy) for proxy in self.target.proxies] if self.target.proxies else None
+            return FTPTarget(ip=passive_ip, port=passive_port, proxies=proxies), None
         except Exception as e:
             return None, e
 
-    @connection_lock
     async def pasv(self) -> Coroutine[Any, Any, Tuple[FTPTarget, Exception]]:
         """
         Get the passive target of the FTP server.
         Returns a tuple of (target, error).
         """
-        return await self.__pasv()
+        async with self.__lock:
+            return await self.__pasv()
 
-    @connection_lock
-    async def get(self, path: str, dstpath: str = None) -> Coroutine[Any, Any, Tuple[str, Exception]]:
+    async def __get(self, path: str, dstpath: str = None) -> Coroutine[Any, Any, Tuple[str, Exception]]:
         """
         Get a file from the FTP server.
         Returns a tuple of (success, error).
         """
         try:
             if dstpath is None:
-                dstpath = str(Path(path).name)
-            await self.network_connection.write(b"RETR %s\r\n" % path.encode())
+                dstpath = os.path.basename(path)
+            await self.__write(b"".join((b"RETR ", path.encode(self.encoding), _CRLF)))
             response, err = await self.__read_response()
             if err is not None:
                 raise err
             response.expect(["150"])
-            with open(dstpath, "wb") as f:
-                async for data, err in self.__read_data_channel(line_based=False):
-                    if err is not None:
-                        raise err
-                    f.write(data)
+            fd = os.open(dstpath, _WRITE_FLAGS)
+            try:
+                _, err = await self.__read_data_channel_to_fd(fd)
+            finally:
+                os.close(fd)
+            if err is not None:
+                raise err
             response, err = await self.__read_response()
             if err is not None:
                 raise err
@@ -536,14 +766,21 @@ class FTPClientConnection:
         except Exception as e:
             return None, e
 
-    @connection_lock_asynciter
-    async def get_file(self, path: str) -> AsyncGenerator[Tuple[bytes, Exception], None]:
+    async def get(self, path: str, dstpath: str = None) -> Coroutine[Any, Any, Tuple[str, Exception]]:
+        """
+        Get a file from the FTP server.
+        Returns a tuple of (success, error).
+        """
+        async with self.__lock:
+            return await self.__get(path, dstpath)
+
+    async def __get_file(self, path: str) -> AsyncGenerator[Tuple[bytes, Exception], None]:
         """
         Get a file from the FTP server.
         Returns a generator of (data, error).
         """
         try:
-            await self.network_connection.write(b"RETR %s\r\n" % path.encode())
+            await self.__write(b"".join((b"RETR ", path.encode(self.encoding), _CRLF)))
             response, err = await self.__read_response()
             if err is not None:
                 raise err
@@ -559,35 +796,66 @@ class FTPClientConnection:
         except Exception as e:
             yield None, e
 
-    @connection_lock
+    async def mget(self, paths: List[str], dest_dir: str = '.', sizes: Dict[str, int] = None) -> AsyncGenerator[Tuple[str, int, Exception], None]:
+        """
+        Download multiple files into dest_dir.
+        The sizes are taken from a single MLSD listing per remote directory instead of a SIZE command per file.
+        If the caller already listed the directories, it can pass the sizes as a {path: size} dict to skip the listing.
+        Returns a generator of (path, size, error), one item per file after it was downloaded.
+        size is None if the file was not in the listing.
+        """
+        async with self.__lock:
+            try:
+                if sizes is None:
+                    sizes = {}
+                    for dirpath in dict.fromkeys(posixpath.dirname(path) for path in paths):
+                        async for name, entry, err in self.__mlsd(dirpath):
+                            if err is not None:
+                                # the sizes stay unknown, RETR reports missing files anyway
+                                break
+                            sizes[posixpath.join(dirpath, name)] = entry['size']
+
+                for path in paths:
+                    _, err = await self.__get(path, os.path.join(dest_dir, posixpath.basename(path)))
+                    yield path, sizes.get(path), err
+            except Exception as e:
+                yield None, None, e
+
+    async def get_file(self, path: str) -> AsyncGenerator[Tuple[bytes, Exception], None]:
+        """
+        Get a file from the FTP server.
+        Returns a generator of (data, error).
+        """
+        async with self.__lock:
+            async for result in self.__get_file(path):
+                yield result
+
     async def mdtm(self, path: str) -> Coroutine[Any, Any, Tuple[datetime.datetime, Exception]]:
         """
         Get the modification time of a file on the FTP server.
         Returns a tuple of (success, error).
         """
-        try:
-            await self.network_connection.write(b"MDTM %s\r\n" % path.encode())
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["213"])
-            mdtm = response.messages[0].decode(self.encoding)
-            date = datetime.datetime.strptime(mdtm, "%Y%m%d%H%M%S")
-            return date, None
-        except Exception as e:
-            return None, e
+        async with self.__lock:
+            try:
+                await self.__write(b"".join((b"MDTM ", path.encode(self.encoding), _CRLF)))
+                response, err = await self.__read_response()
+                if err is not None:
+                    raise err
+                response.expect(["213"])
+                return _parse_ftp_ts(response.messages[0]), None
+            except Exception as e:
+                return None, e
 
-    @connection_lock_asynciter
-    async def mlsd(self, path: str = '') -> AsyncGenerator[Tuple[str, dict, Exception], None]:
+    async def __mlsd(self, path: str = '') -> AsyncGenerator[Tuple[str, dict, Exception], None]:
         """
         Lists the contents of a directory in a standardized machine-readable format.
         Returns a tuple of (success, error).
         """
         try:
             if path == '':
-                await self.network_connection.write(b"MLSD\r\n")
+                await self.__write(_CMD_MLSD)
             else:
-                await self.network_connection.write(b"MLSD %s\r\n" % path.encode())
+                await self.__write(b"".join((b"MLSD ", path.encode(self.encoding), _CRLF)))
             response, err = await self.__read_response()
             if err is not None:
                 raise err
@@ -595,13 +863,12 @@ class FTPClientConnection:
             async for data, err in self.__read_data_channel(line_based=True):
                 if err is not None:
                     raise err
-                data = data.decode(self.encoding)
-                for line in data.split("\r\n"):
-                    #parse the line
-                    if line == '':
-                        continue
-                    entry = parse_mlsd_line(line, path)
-                    yield entry['name'], entry, None
+                # the data channel already split on \n, only the \r is left
+                line = data.rstrip(b"\r").decode(self.encoding)
+                if line == '':
+                    continue
+                entry = parse_mlsd_line(line, path)
+                yield entry['name'], entry, None
             response, err = await self.__read_response()
             if err is not None:
                 raise err
@@ -609,270 +876,295 @@ class FTPClientConnection:
         except Exception as e:
             yield None, None, e
 
-    @connection_lock
+    async def mlsd(self, path: str = '') -> AsyncGenerator[Tuple[str, dict, Exception], None]:
+        """
+        Lists the contents of a directory in a standardized machine-readable format.
+        Returns a tuple of (success, error).
+        """
+        async with self.__lock:
+            async for result in self.__mlsd(path):
+                yield result
+
     async def mlst(self, path: str) -> Coroutine[Any, Any, Tuple[str, dict, Exception]]:
         """
         Provides data about exactly the object named on its command line in a standardized machine-readable format.
         Returns a tuple of (success, error).
         """
-        try:
-            await self.network_connection.write(b"MLST %s\r\n" % path.encode())
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["250"])
-            entry = parse_mlsd_line(response.messages[1])
-            return entry['name'], entry, None
-        except Exception as e:
-            return None, None, e
+        async with self.__lock:
+            try:
+                await self.__write(b"".join((b"MLST ", path.encode(self.encoding), _CRLF)))
+                response, err = await self.__read_response()
+                if err is not None:
+                    raise err
+                response.expect(["250"])
+                entry = parse_mlsd_line(response.messages[1])
+                return entry['name'], entry, None
+            except Exception as e:
+                return None, None, e
 
-    @connection_lock
     async def mkd(self, path: str) -> Coroutine[Any, Any, Tuple[bool, Exception]]:
         """
         Create a directory on the FTP server.
         Returns a tuple of (success, error).
         """
-        try:
-            await self.network_connection.write(b"MKD %s\r\n" % path.encode())
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["257"])
-            return True, None
-        except Exception as e:
-            return False, e
+        async with self.__lock:
+            _, err = await self.__simple_cmd(b"MKD ", ["257"], path)
+            return err is None, err
 
-    @connection_lock
     async def rmd(self, path: str) -> Coroutine[Any, Any, Tuple[bool, Exception]]:
         """
         Remove a directory on the FTP server.
         Returns a tuple of (success, error).
         """
-        try:
-            await self.network_connection.write(b"RMD %s\r\n" % path.encode())
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["250"])
-            return True, None
-        except Exception as e:
-            return False, e
+        async with self.__lock:
+            _, err = await self.__simple_cmd(b"RMD ", ["250"], path)
+            return err is None, err
 
-    @connection_lock
     async def noop(self) -> Coroutine[Any, Any, Tuple[bool, Exception]]:
         """
         No operation.
         Returns a tuple of (success, error).
         """
-        try:
-            await self.network_connection.write(b"NOOP\r\n")
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["200"])
-            return True, None
-        except Exception as e:
-            return False, e
+        async with self.__lock:
+            _, err = await self.__simple_cmd(_CMD_NOOP, ["200"])
+            return err is None, err
 
-    @connection_lock
     async def acct(self) -> Coroutine[Any, Any, Tuple[str, Exception]]:
         """
         Get the account information of the FTP server.
         Returns a tuple of (string, error).
         """
-        try:
-            await self.network_connection.write(b"ACCT\r\n")
-            response, err = await self.__read_response()
+        async with self.__lock:
+            response, err = await self.__simple_cmd(_CMD_ACCT, ["200"])
             if err is not None:
-                raise err
-            response.expect(["200"])
+                return None, err
             return response.messages, None # TODO: check if this is correct
-        except Exception as e:
-            return None, e
     
-    @connection_lock
     async def site(self, command: str) -> Coroutine[Any, Any, Tuple[str, Exception]]:
         """
         Execute a SITE command on the FTP server.
         Returns a tuple of (string, error).
         """
-        try:
-            await self.network_connection.write(b"SITE %s\r\n" % command.encode())
-            response, err = await self.__read_response()
+        async with self.__lock:
+            response, err = await self.__simple_cmd(b"SITE ", ["214"], command)
             if err is not None:
-                raise err
-            response.expect(["214"])
+                return None, err
             return response.messages[0], None
-        except Exception as e:
-            return None, e
 
-    @connection_lock
     async def rawcmd(self, command: str) -> Coroutine[Any, Any, Tuple[FTPResponse, Exception]]:
         """
         Execute a raw command on the FTP server.
         Returns a tuple of (FTPResponse, error).
         """
-        try:
-            await self.network_connection.write(b"%s\r\n" % command.encode())
-            return await self.__read_response()
-        except Exception as e:
-            return None, e
+        async with self.__lock:
+            try:
+                # a raw command can change anything the connection keeps track of
+                self.__current_type = None
+                self.__cwd = None
+                await self.__write(b"".join((command.encode(self.encoding), _CRLF)))
+                return await self.__read_response()
+            except Exception as e:
+                return None, e
 
-    @connection_lock
     async def stor(self, path: str, data: io.BytesIO = None) -> AsyncGenerator[Tuple[str, Exception], None]:
         """
         Store a file on the FTP server.
         Returns a tuple of (string, error).
         """
-        try:
-            await self.network_connection.write(b"STOR %s\r\n" % path.encode())
-            response, err = await self.__read_response()
-            if err is not None:
-                    raise err
-            response.expect(["150"])
-            if data is not None:
-                async for data, err in self.__write_data_channel(data):
-                    if err is not None:
+        async with self.__lock:
+            try:
+                await self.__write(b"".join((b"STOR ", path.encode(self.encoding), _CRLF)))
+                response, err = await self.__read_response()
+                if err is not None:
                         raise err
-            else:
-                with open(path, "rb") as f:
-                    async for data, err in self.__write_data_channel(f):
+                response.expect(["150"])
+                if data is not None:
+                    async for data, err in self.__write_data_channel(data):
                         if err is not None:
                             raise err
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["226"])
-            return path, None
-        except Exception as e:
-            return None, e
+                else:
+                    with open(path, "rb") as f:
+                        async for data, err in self.__write_data_channel(f):
+                            if err is not None:
+                                raise err
+                response, err = await self.__read_response()
+                if err is not None:
+                    raise err
+                response.expect(["226"])
+                return path, None
+            except Exception as e:
+                return None, e
     
-    @connection_lock
-    async def appe(self, path: str, data: io.BytesIO = None) -> AsyncGenerator[Tuple[str, Exception], None]:
+    async def __stor_stream(self, path: str, data: io.BytesIO, chunksize: int = 1 << 20) -> AsyncGenerator[Tuple[int, Exception], None]:
         """
-        Append (+create) a file on the FTP server.
-        Returns a tuple of (success, error).
+        Store a file on the FTP server, streaming data over a single data connection.
+        data is any readable binary file-like object.
+        Returns a generator of (bytes_sent, error), one item per chunk written.
         """
         try:
-            if isinstance(data, bytes):
-                data = io.BytesIO(data)
-            await self.network_connection.write(b"APPE %s\r\n" % path.encode())
+            await self.__write(b"".join((b"STOR ", path.encode(self.encoding), _CRLF)))
             response, err = await self.__read_response()
             if err is not None:
                 raise err
             response.expect(["150"])
-            if data is not None:
-                async for data, err in self.__write_data_channel(data):
-                    if err is not None:
-                        raise err
-            else:
-                with open(path, "rb") as f:
-                    async for data, err in self.__write_data_channel(f):
-                        if err is not None:
-                            raise err
+            async for sent, err in self.__write_data_channel(data, chunksize):
+                if err is not None:
+                    raise err
+                yield sent, None
             response, err = await self.__read_response()
             if err is not None:
                 raise err
             response.expect(["226"])
-            return True, None
         except Exception as e:
-            return False, e
+            yield None, e
+
+    async def stor_stream(self, path: str, data: io.BytesIO, chunksize: int = 1 << 20) -> AsyncGenerator[Tuple[int, Exception], None]:
+        """
+        Store a file on the FTP server, streaming data over a single data connection.
+        data is any readable binary file-like object.
+        Returns a generator of (bytes_sent, error), one item per chunk written.
+        """
+        async with self.__lock:
+            async for result in self.__stor_stream(path, data, chunksize):
+                yield result
+
+    async def stor_file(self, path: str, local_path: str = None) -> AsyncGenerator[Tuple[int, Exception], None]:
+        """
+        Upload a local file to the FTP server with STOR.
+        The file is sent with sendfile when the platform and the data channel allow it.
+        If local_path is not set, path is used for the local file as well.
+        Returns a generator of (bytes_sent, error).
+        """
+        try:
+            with open(local_path if local_path is not None else path, "rb") as f:
+                async for sent, err in self.stor_stream(path, f):
+                    yield sent, err
+        except Exception as e:
+            yield None, e
+
+    async def appe(self, path: str, data: io.BytesIO = None) -> AsyncGenerator[Tuple[str, Exception], None]:
+        """
+        Append (+create) a file on the FTP server.
+        Returns a tuple of (success, error).
+        """
+        async with self.__lock:
+            try:
+                if isinstance(data, bytes):
+                    data = io.BytesIO(data)
+                await self.__write(b"".join((b"APPE ", path.encode(self.encoding), _CRLF)))
+                response, err = await self.__read_response()
+                if err is not None:
+                    raise err
+                response.expect(["150"])
+                if data is not None:
+                    async for data, err in self.__write_data_channel(data):
+                        if err is not None:
+                            raise err
+                else:
+                    with open(path, "rb") as f:
+                        async for data, err in self.__write_data_channel(f):
+                            if err is not None:
+                                raise err
+                response, err = await self.__read_response()
+                if err is not None:
+                    raise err
+                response.expect(["226"])
+                return True, None
+            except Exception as e:
+                return False, e
 
-    @connection_lock
     async def dele(self, path: str) -> Coroutine[Any, Any, Tuple[bool, Exception]]:
         """
         Delete a file on the FTP server.
         Returns a tuple of (success, error).
         """
-        try:
-            await self.network_connection.write(b"DELE %s\r\n" % path.encode())
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["250"])
-            return True, None
-        except Exception as e:
-            return False, e
+        async with self.__lock:
+            _, err = await self.__simple_cmd(b"DELE ", ["250"], path)
+            return err is None, err
 
-    @connection_lock
     async def rename(self, oldpath: str, newpath: str) -> Coroutine[Any, Any, Tuple[bool, Exception]]:
         """
         Rename a file on the FTP server from oldpath to newpath.
         Returns a tuple of (success, error).
         """
-        try:
-            # First specify the old filename
-            await self.network_connection.write(b"RNFR %s\r\n" % oldpath.encode())
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["350"])
-            
-            # Then specify the new filename
-            await self.network_connection.write(b"RNTO %s\r\n" % newpath.encode())
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["250"])
-            return True, None
-        except Exception as e:
-            return False, e
+        async with self.__lock:
+            try:
+                # RNFR and RNTO are sent together, saving a round trip.
+                # Both replies are always read so the control channel stays in sync,
+                # if RNFR fails the server rejects RNTO as well (503)
+                await self.__write_pipelined([
+                    b"".join((b"RNFR ", oldpath.encode(self.encoding), _CRLF)),
+                    b"".join((b"RNTO ", newpath.encode(self.encoding), _CRLF)),
+                ])
+                rnfr_response, err = await self.__read_response()
+                if err is not None:
+                    raise err
+                response, err = await self.__read_response()
+                if err is not None:
+                    raise err
+                rnfr_response.expect(["350"])
+                response.expect(["250"])
+                return True, None
+            except Exception as e:
+                return False, e
 
-    @connection_lock
     async def rest_get(self, remote_path: str, local_path: str = None) -> Coroutine[Any, Any, Tuple[bool, Exception]]:
         """
         Resume a previously interrupted file transfer.
         Checks if file exists locally and on server, compares sizes, and continues download if needed.
         Returns a tuple of (success, error).
         """
-        try:
-            if local_path is None:
-                local_path = str(Path(remote_path).name)
-
-            # Get remote file size
-            remote_size, err = await self.__size(remote_path)
-            if err is not None:
-                raise err
+        async with self.__lock:
+            try:
+                if local_path is None:
+                    local_path = os.path.basename(remote_path)
 
-            # Check local file
-            local_size = 0
-            if Path(local_path).exists():
-                local_size = Path(local_path).stat().st_size
-                if local_size >= remote_size:
-                    return True, None  # File already completely downloaded
+                # Get remote file size
+                remote_size, err = await self.__size(remote_path)
+                if err is not None:
+                    raise err
 
-            # Set restart point
-            await self.network_connection.write(b"REST %d\r\n" % local_size)
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["350"])
+                # Check local file
+                local_size = 0
+                if os.path.exists(local_path):
+                    local_size = os.path.getsize(local_path)
+                    if local_size >= remote_size:
+                        return True, None  # File already completely downloaded
 
-            # Start the transfer
-            await self.network_connection.write(b"RETR %s\r\n" % remote_path.encode())
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["150"])
+                # Set restart point
+                await self.__write(b"".join((b"REST ", str(local_size).encode(), _CRLF)))
+                response, err = await self.__read_response()
+                if err is not None:
+                    raise err
+                response.expect(["350"])
 
-            # Open file in append mode
-            with open(local_path, "ab") as f:
-                async for data, err in self.__read_data_channel():
-                    if err is not None:
-                        raise err
-                    f.write(data)
+                # Start the transfer
+                await self.__write(b"".join((b"RETR ", remote_path.encode(self.encoding), _CRLF)))
+                response, err = await self.__read_response()
+                if err is not None:
+                    raise err
+                response.expect(["150"])
+
+                # Open file in append mode
+                fd = os.open(local_path, _APPEND_FLAGS)
+                try:
+                    _, err = await self.__read_data_channel_to_fd(fd)
+                finally:
+                    os.close(fd)
+                if err is not None:
+                    raise err
 
-            response, err = await self.__read_response()
-            if err is not None:
-                raise err
-            response.expect(["226"])
-            return True, None
-        except Exception as e:
-            return False, e
+                response, err = await self.__read_response()
+                if err is not None:
+                    raise err
+                response.expect(["226"])
+                return True, None
+            except Exception as e:
+                return False, e
     
     async def __quit(self):
         try:
-            await self.network_connection.write(b"QUIT\r\n")
+            await self.__write(_CMD_QUIT)
             response, err = await self.__read_response()
             if err is not None:
                 raise err
@@ -881,13 +1173,13 @@ class FTPClientConnection:
         except Exception as e:
             return False, e
 
-    @connection_lock
     async def quit(self) -> Coroutine[Any, Any, Tuple[bool, Exception]]:
         """
         Quit the FTP server.
         Returns a tuple of (success, error).
         """
-        return await self.__quit()
+        async with self.__lock:
+            return await self.__quit()
 
     async def enum_all(self, path: str = '', depth: int = 3, filter_cb = None) -> AsyncGenerator[Tuple[str, Exception], None]:
         """
@@ -895,27 +1187,29 @@ class FTPClientConnection:
         Returns a generator of (path, error).
         """
         try:
-            dirs = [] # must store dirs, because the ftp protocol doesn't support multiple commands in one go
-            async for oname, entry, err in self.mlsd(path):
-                if err is not None:
-                    yield entry, err
-                    continue
-                
-                if filter_cb is not None:
-                    res = await filter_cb(entry['type'], entry)
-                    if res is False:
+            # directories still to be listed, the top of the stack is listed next.
+            # this gives the same depth-first order as walking the tree recursively
+            stack = [(path, depth)]
+            while len(stack) > 0:
+                path, depth = stack.pop()
+                dirs = [] # must store dirs, because the ftp protocol doesn't support multiple commands in one go
+                async for oname, entry, err in self.mlsd(path):
+                    if err is not None:
+                        yield entry, err
                         continue
 
-                yield entry, None
+                    if filter_cb is not None:
+                        res = await filter_cb(entry['type'], entry)
+                        if res is False:
+                            continue
+
+                    yield entry, None
+
+                    if entry['type'] == 'dir' and depth > 0:
+                        dirs.append((entry['fullpath'], depth - 1))
+
+                stack.extend(reversed(dirs))
 
-                if entry['type'] == 'dir' and depth > 0:
-                    dirs.append(entry['fullpath'])
-            
-            for path in dirs:
-                async for data, err in self.enum_all(path, depth - 1, filter_cb=filter_cb):
-                    yield data, None
-                    
-                    
         except Exception as e:
             yield None, e
 
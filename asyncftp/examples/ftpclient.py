@@ -64,7 +64,7 @@ class FTPClient(aiocmd.PromptToolkitCmd):
         print(err)
         return False, err
 
-    async def print(self, *args, **kwargs):
+    def print(self, *args, **kwargs):
         if self.silent is False:
             print(*args, **kwargs)
 
@@ -75,9 +75,9 @@ class FTPClient(aiocmd.PromptToolkitCmd):
             _, err = await self.connection.connect()
             if err is not None:
                 raise err
-            await self.print('Connected to FTP server')
+            self.print('Connected to FTP server')
             for line in self.connection.banner:
-                await self.print(line)
+                self.print(line)
             await self.refresh_prompt()
             return True, None
         except Exception as e:
@@ -88,7 +88,7 @@ class FTPClient(aiocmd.PromptToolkitCmd):
             async for line, err in self.connection.list():
                 if err is not None:
                     raise err
-                await self.print(line)
+                self.print(line)
             return True, None
         except Exception as e:
             return await self.handle_error(e)
@@ -104,7 +104,7 @@ class FTPClient(aiocmd.PromptToolkitCmd):
             async for line, err in self.connection.help(command):
                 if err is not None:
                     raise err
-                await self.print(line)
+                self.print(line)
             return True, None
         except Exception as e:
             return await self.handle_error(e)
@@ -114,7 +114,7 @@ class FTPClient(aiocmd.PromptToolkitCmd):
             async for line, err in self.connection.feat():
                 if err is not None:
                     raise err
-                await self.print(line)
+                self.print(line)
             return True, None
         except Exception as e:
             return await self.handle_error(e)
@@ -124,7 +124,7 @@ class FTPClient(aiocmd.PromptToolkitCmd):
             async for line, err in self.connection.syst():
                 if err is not None:
                     raise err
-                await self.print(line)
+                self.print(line)
             return True, None
         except Exception as e:
             return await self.handle_error(e)
@@ -134,7 +134,7 @@ class FTPClient(aiocmd.PromptToolkitCmd):
             async for line, err in self.connection.stat():
                 if err is not None:
                     raise err
-                await self.print(line)
+                self.print(line)
             return True, None
         except Exception as e:
             return await self.handle_error(e)
@@ -144,7 +144,7 @@ class FTPClient(aiocmd.PromptToolkitCmd):
             _, err = await self.connection.cwd(path)
             if err is not None:
                 raise err
-            await self.print('Changed working directory to %s' % path)
+            self.print('Changed working directory to %s' % path)
             await self.refresh_prompt()
             return True, None
         except Exception as e:
@@ -155,7 +155,7 @@ class FTPClient(aiocmd.PromptToolkitCmd):
             _, err = await self.connection.cdup()
             if err is not None:
                 raise err
-            await self.print('Changed working directory to parent')
+            self.print('Changed working directory to parent')
             await self.refresh_prompt()
             return True, None
         except Exception as e:
@@ -166,7 +166,7 @@ class FTPClient(aiocmd.PromptToolkitCmd):
             path, err = await self.connection.pwd()
             if err is not None:
                 raise err
-            await self.print('Current working directory: %s' % path)
+            self.print('Current working directory: %s' % path)
             return True, None
         except Exception as e:
             return await self.handle_error(e)
@@ -176,7 +176,7 @@ class FTPClient(aiocmd.PromptToolkitCmd):
             size, err = await self.connection.size(path)
             if err is not None:
                 raise err
-            await self.print('Size of %s: %s' % (path, size))
+            self.print('Size of %s: %s' % (path, size))
             return True, None
         except Exception as e:
             return await self.handle_error(e)
@@ -187,7 +187,7 @@ class FTPClient(aiocmd.PromptToolkitCmd):
     #        _, err = await self.connection.type(type)
     #        if err is not None:
     #            raise err
-    #        await self.print('Type set to %s' % type)
+    #        self.print('Type set to %s' % type)
     #        return True, None
     #    except Exception as e:
     #        return await self.handle_error(e)
@@ -197,25 +197,57 @@ class FTPClient(aiocmd.PromptToolkitCmd):
     #        target, err = await self.connection.pasv()
     #        if err is not None:
     #            raise err
-    #        await self.print('Passive mode set to %s' % target)
+    #        self.print('Passive mode set to %s' % target)
     #        return True, None
     #    except Exception as e:
     #        return await self.handle_error(e)   
 
     async def do_get(self, path:str):
         try:
-            fsize, err = await self.connection.size(path)
-            if err is not None:
-                raise err
-            await self.print('Downloading %s (%s bytes)' % (path, fsize))
-            pbar = tqdm.tqdm(total=fsize, unit='B', unit_scale=True)
-            with open(path, 'wb') as f:
-                async for data, err in self.connection.get_file(path):
-                    if err is not None:
-                        raise err
-                    f.write(data)
-                    pbar.update(len(data))
-            pbar.close()
+            # SIZE and RETR are issued under a single lock acquisition
+            async with self.connection.batch() as batch:
+                fsize, err = await batch.size(path)
+                if err is not None:
+                    raise err
+                self.print('Downloading %s (%s bytes)' % (path, fsize))
+                pbar = tqdm.tqdm(total=fsize, unit='B', unit_scale=True)
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0))
+                try:
+                    async for data, err in batch.get_file(path):
+                        if err is not None:
+                            raise err
+                        view = memoryview(data)
+                        while view:
+                            view = view[os.write(fd, view):]
+                        pbar.update(len(data))
+                finally:
+                    os.close(fd)
+                pbar.close()
+            return True, None
+        except Exception as e:
+            return await self.handle_error(e)
+
+    async def do_mget(self, pattern:str):
+        try:
+            # the pattern only applies to the file name, not to the directory part
+            dirpath, _, name_pattern = pattern.rpartition('/')
+            if dirpath == '' and pattern.startswith('/'):
+                # /*.txt is in the root directory, not in the current one
+                dirpath = '/'
+            sizes = {}
+            async for name, entry, err in self.connection.mlsd(dirpath):
+                if err is not None:
+                    raise err
+                if entry['type'] == 'file' and fnmatch.fnmatch(name, name_pattern):
+                    sizes[entry['fullpath']] = entry['size']
+            if len(sizes) == 0:
+                self.print('No files matching %s' % pattern)
+                return True, None
+            # the listing above already has the sizes, don't let mget list the directory again
+            async for path, fsize, err in self.connection.mget(list(sizes), sizes=sizes):
+                if err is not None:
+                    raise err
+                self.print('Downloaded %s (%s bytes)' % (path, fsize))
             return True, None
         except Exception as e:
             return await self.handle_error(e)
@@ -223,17 +255,12 @@ class FTPClient(aiocmd.PromptToolkitCmd):
     async def do_put(self, path:str):
         try:
             fsize = os.path.getsize(path)
-            await self.print('Uploading %s (%s bytes)' % (path, fsize))
+            self.print('Uploading %s (%s bytes)' % (path, fsize))
             pbar = tqdm.tqdm(total=fsize, unit='B', unit_scale=True)
-            with open(path, 'rb') as f:
-                while True:
-                    data = f.read(65536)
-                    if len(data) == 0:
-                        break
-                    _, err = await self.connection.appe(path, data)
-                    if err is not None:
-                        raise err
-                    pbar.update(len(data))
+            async for sent, err in self.connection.stor_file(path):
+                if err is not None:
+                    raise err
+                pbar.update(sent)
             pbar.close()
             return True, None
         except Exception as e:
@@ -244,7 +271,7 @@ class FTPClient(aiocmd.PromptToolkitCmd):
             _, err = await self.connection.rename(oldpath, newpath)
             if err is not None:
                 raise err
-            await self.print('Renamed %s to %s' % (oldpath, newpath))
+            self.print('Renamed %s to %s' % (oldpath, newpath))
             return True, None
         except Exception as e:
             return await self.handle_error(e)
@@ -254,7 +281,7 @@ class FTPClient(aiocmd.PromptToolkitCmd):
             _, err = await self.connection.dele(path)
             if err is not None:
                 raise err
-            await self.print('Deleted %s' % path)
+            self.print('Deleted %s' % path)
             return True, None
         except Exception as e:
             return await self.handle_error(e)
@@ -264,7 +291,7 @@ class FTPClient(aiocmd.PromptToolkitCmd):
             _, err = await self.connection.mkd(path)
             if err is not None:
                 raise err
-            await self.print('Created directory %s' % path)
+            self.print('Created directory %s' % path)
             return True, None
         except Exception as e:
             return await self.handle_error(e)
@@ -274,7 +301,7 @@ class FTPClient(aiocmd.PromptToolkitCmd):
             _, err = await self.connection.rmd(path)
             if err is not None:
                 raise err
-            await self.print('Removed directory %s' % path)
+            self.print('Removed directory %s' % path)
             return True, None
         except Exception as e:
             return await self.handle_error(e)
@@ -297,7 +324,11 @@ async def amain(url:str, silent:bool=False, commands:List[str]=None, no_interact
                     await client.run()
                     sys.exit(0)
                 
-                cmd = shlex.split(command)
+                # shlex is only needed for quoting and escapes, plain commands are split directly
+                if '"' in command or "'" in command or '\\' in command:
+                    cmd = shlex.split(command)
+                else:
+                    cmd = command.split()
                 if cmd[0] == 'login':
                     _, err = await client.do_login()
                     if err is not None:
@@ -336,7 +367,14 @@ def main():
         print("No URL provided")
         return
 
-    asyncio.run(amain(args.url, args.silent, args.commands, args.no_interactive, args.continue_on_error))
+    # uvloop is optional (pip install asyncftp[fast]), older versions without uvloop.run are skipped
+    try:
+        import uvloop
+        run = uvloop.run
+    except (ImportError, AttributeError):
+        run = asyncio.run
+
+    run(amain(args.url, args.silent, args.commands, args.no_interactive, args.continue_on_error))
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,35 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+# Optional C implementation of the FTPPacketizer line splitter.
+# asyncftp.network.packetizer falls back to pure python if this is not built.
+
+from libc.string cimport memchr
+from cpython.bytearray cimport PyByteArray_AS_STRING, PyByteArray_GET_SIZE
+from cpython.unicode cimport PyUnicode_DecodeUTF8
+
+cpdef tuple split_lines(bytearray buf):
+    """
+    Splits all complete lines off the start of buf.
+    Returns a tuple of (lines, consumed) where lines are the decoded lines
+    without the line terminators and consumed is the number of bytes they took up in buf.
+    The trailing partial line is not consumed, buf itself is not modified.
+    Decoding never fails, invalid utf-8 is decoded with surrogateescape.
+    """
+    cdef const char* data = PyByteArray_AS_STRING(buf)
+    cdef const char* start = data
+    cdef const char* end = data + PyByteArray_GET_SIZE(buf)
+    cdef const char* nl
+    cdef Py_ssize_t length
+    cdef list lines = []
+
+    while start < end:
+        nl = <const char*>memchr(start, 10, end - start) # \n
+        if nl == NULL:
+            break
+        length = nl - start
+        while length > 0 and start[length - 1] == 13: # \r, same as rstrip
+            length -= 1
+        # invalid bytes are kept as surrogates, same as the python code
+        lines.append(PyUnicode_DecodeUTF8(start, length, "surrogateescape"))
+        start = nl + 1
+
+    return lines, start - data
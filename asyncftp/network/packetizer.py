@@ -1,31 +1,53 @@
+from typing import List
 from asysocks.unicomm.common.packetizers import Packetizer
 
+# C line splitter, only present if the optional extension could be built
+try:
+    from asyncftp.network._packetizer import split_lines
+except ImportError:
+    split_lines = None
+
 class FTPPacketizer(Packetizer):
     def __init__(self, max_read_size: int = 65535):
         super().__init__(max_read_size)
-        self.in_buffer = b''
+        self.in_buffer = bytearray()
+
+    def drain_lines(self) -> List[str]:
+        """
+        Returns all complete lines currently in the buffer, without the line terminators.
+        The trailing partial line is kept for the next call.
+        """
+        if split_lines is not None:
+            lines, consumed = split_lines(self.in_buffer)
+            del self.in_buffer[:consumed]
+            return lines
+        # all complete lines are split off in one go, only the partial line is kept
+        end = self.in_buffer.rfind(b'\n')
+        if end == -1:
+            return []
+        # decoded in one call, \n never occurs inside a multi-byte utf-8 sequence
+        # so splitting the text gives the same lines as splitting the bytes.
+        # the lines are consumed before decoding and invalid bytes are kept as surrogates,
+        # a reply that is not utf-8 (e.g. a latin-1 path) must not wedge the buffer
+        data = self.in_buffer[:end]
+        del self.in_buffer[:end + 1]
+        text = data.decode('utf-8', 'surrogateescape')
+        return [line.rstrip('\r') for line in text.split('\n')]
 
     def process_buffer(self):
         # ftp is line based protocol
         # so we need to split the buffer by \r\n
         # and yield the lines
-        while len(self.in_buffer) > 0:
-            pos = self.in_buffer.find(b'\n')
-            if pos == -1:
-                break
-            temp = self.in_buffer[:pos]
-            self.in_buffer = self.in_buffer[pos + 1:]
-            yield temp.decode()
-           
+        yield from self.drain_lines()
 
     async def data_out(self, data:bytes):
         yield data
 
     async def data_in(self, data):
-        if data is None:
-            for packet in self.process_buffer():
-                yield packet
-        else:
-            self.in_buffer += data
-            for packet in self.process_buffer():
-                yield packet
+        # all lines parsed from a read are handed over as a single list,
+        # so the reader only has to be awaited once per network read
+        if data is not None:
+            self.in_buffer.extend(data)
+        lines = self.drain_lines()
+        if len(lines) > 0:
+            yield lines
@@ -1,6 +1,21 @@
-from setuptools import setup, find_packages
+from setuptools import setup, find_packages, Extension
+import os
 import re
 
+# the C line splitter is optional, without Cython (or a compiler) the pure python code is used
+# ASYNCFTP_NO_EXT=1 skips it, make publish uses this to build the pure python wheel for PyPI
+ext_modules = []
+try:
+	if os.environ.get('ASYNCFTP_NO_EXT'):
+		raise ImportError('C extension disabled by ASYNCFTP_NO_EXT')
+	from Cython.Build import cythonize
+	ext_modules = cythonize(
+		[Extension('asyncftp.network._packetizer', ['asyncftp/network/_packetizer.pyx'], optional=True)],
+		language_level=3,
+	)
+except ImportError:
+	pass
+
 VERSIONFILE="asyncftp/_version.py"
 verstrline = open(VERSIONFILE, "rt").read()
 VSRE = r"^__version__ = ['\"]([^'\"]*)['\"]"
@@ -32,6 +47,7 @@ setup(
 	url="https://github.com/skelsec/asyncftp",
 
 	zip_safe = False,
+	ext_modules = ext_modules,
 	#
 	# license="LICENSE.txt",
 	description="Asynchronous FTP client implementation",
@@ -46,6 +62,11 @@ setup(
 		'colorama',
 		'wcwidth',
 	],
+	extras_require={
+		'fast': [
+			'uvloop; platform_system!="Windows"',
+		],
+	},
 	
 	classifiers=[
 		"Programming Language :: Python :: 3.7",
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from asyncftp.examples.ftpclient import FTPClient
+from ftpserver import start_server
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+class TestFTPClientUvloop(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        cls.server, cls.url = start_server(cls.root, perm='elrw')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close_all()
+
+    @unittest.skipIf(uvloop is None, 'uvloop is not installed')
+    def test_put(self):
+        # main() runs the client on uvloop when it is installed
+        local_dir = tempfile.mkdtemp()
+        data = os.urandom(3 * 1024 * 1024)
+        with open(os.path.join(local_dir, 'upload.bin'), 'wb') as f:
+            f.write(data)
+
+        async def put():
+            client = FTPClient(self.url, silent=True)
+            _, err = await client.do_login()
+            self.assertIsNone(err)
+            try:
+                _, err = await client.connection.type('I')
+                self.assertIsNone(err)
+                cwd = os.getcwd()
+                os.chdir(local_dir)
+                try:
+                    return await client.do_put('upload.bin')
+                finally:
+                    os.chdir(cwd)
+            finally:
+                await client.connection.disconnect()
+
+        with mock.patch('tqdm.tqdm'):
+            _, err = uvloop.run(put())
+        self.assertIsNone(err)
+        with open(os.path.join(self.root, 'upload.bin'), 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+if __name__ == '__main__':
+    unittest.main()
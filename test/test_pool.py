@@ -0,0 +1,94 @@
+import os
+import asyncio
+import tempfile
+import unittest
+
+from asyncftp.common.factory import FTPConnectionFactory
+from asyncftp.common.pool import FTPConnectionPool
+from ftpserver import start_server
+
+# the server drops idle control connections after this many seconds
+SERVER_TIMEOUT = 0.5
+
+class TestPoolDeadConnections(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        with open(os.path.join(cls.root, 'file.txt'), 'wb') as f:
+            f.write(b'A' * 100)
+        cls.server, cls.url = start_server(cls.root, timeout=SERVER_TIMEOUT)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close_all()
+
+    async def asyncSetUp(self):
+        self.pool = FTPConnectionPool(FTPConnectionFactory.from_url(self.url), max_size=1)
+
+    async def asyncTearDown(self):
+        await self.pool.aclose()
+
+    async def test_server_closed_connection_is_marked_dead(self):
+        connection, err = await self.pool.acquire()
+        self.assertIsNone(err)
+        await asyncio.sleep(SERVER_TIMEOUT * 3)
+        # the first command reads the timeout reply, the next one hits EOF
+        for _ in range(2):
+            _, err = await connection.noop()
+            self.assertIsNotNone(err)
+        self.assertFalse(connection.is_alive())
+        await self.pool.release(connection)
+
+        new_connection, err = await self.pool.acquire()
+        self.assertIsNone(err)
+        self.assertIsNot(new_connection, connection)
+        self.assertIsNone(connection.network_connection)
+        await self.pool.release(new_connection)
+
+    async def test_size_many_discards_failed_connection(self):
+        result = await self.pool.size_many(['file.txt'])
+        self.assertEqual(result, [(100, None)])
+        await asyncio.sleep(SERVER_TIMEOUT * 3)
+        # served by the connection the server closed in the meantime
+        (size, err), = await self.pool.size_many(['file.txt'])
+        self.assertIsNotNone(err)
+        # the broken connection was not pooled again
+        result = await self.pool.size_many(['file.txt'])
+        self.assertEqual(result, [(100, None)])
+
+    async def test_connection_discarded_on_error(self):
+        with self.assertRaises(ValueError):
+            async with self.pool.connection() as connection:
+                raise ValueError('operation failed')
+        self.assertIsNone(connection.network_connection)
+        async with self.pool.connection() as new_connection:
+            self.assertIsNot(new_connection, connection)
+
+    async def test_acquire_disconnects_dead_idle_connection(self):
+        connection, err = await self.pool.acquire()
+        self.assertIsNone(err)
+        await self.pool.release(connection)
+        # as if a read had seen EOF while the connection was idle
+        connection.connection_closed_evt.set()
+
+        new_connection, err = await self.pool.acquire()
+        self.assertIsNone(err)
+        self.assertIsNot(new_connection, connection)
+        self.assertIsNone(connection.network_connection)
+        await self.pool.release(new_connection)
+
+    async def test_enum_all_discards_connection_after_failed_listing(self):
+        connection, err = await self.pool.acquire()
+        self.assertIsNone(err)
+        await self.pool.release(connection)
+
+        results = [(entry, err) async for entry, err in self.pool.enum_all('nope', 1)]
+        self.assertEqual(len(results), 1)
+        self.assertIsNotNone(results[0][1])
+        self.assertIsNone(connection.network_connection)
+
+        result = await self.pool.size_many(['file.txt'])
+        self.assertEqual(result, [(100, None)])
+
+if __name__ == '__main__':
+    unittest.main()
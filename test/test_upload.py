@@ -0,0 +1,55 @@
+import os
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+
+from asyncftp.common.factory import FTPConnectionFactory
+from ftpserver import start_server
+
+class TestUpload(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        cls.server, cls.url = start_server(cls.root, perm='elrw')
+        cls.local_path = os.path.join(tempfile.mkdtemp(), 'upload.bin')
+        cls.data = os.urandom(3 * 1024 * 1024)
+        with open(cls.local_path, 'wb') as f:
+            f.write(cls.data)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close_all()
+
+    async def asyncSetUp(self):
+        self.connection = FTPConnectionFactory.from_url(self.url).get_connection()
+        _, err = await self.connection.connect()
+        self.assertIsNone(err)
+        _, err = await self.connection.type('I')
+        self.assertIsNone(err)
+
+    async def asyncTearDown(self):
+        await self.connection.disconnect()
+
+    async def upload_and_check(self, name):
+        results = [result async for result in self.connection.stor_file(name, self.local_path)]
+        for _, err in results:
+            self.assertIsNone(err)
+        self.assertEqual(sum(sent for sent, _ in results), len(self.data))
+        with open(os.path.join(self.root, name), 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        # the control channel is still in sync
+        _, err = await self.connection.noop()
+        self.assertIsNone(err)
+
+    async def test_stor_file(self):
+        await self.upload_and_check('sendfile.bin')
+
+    async def test_stor_file_without_loop_sendfile(self):
+        # same as uvloop, which doesn't implement loop.sendfile at all
+        loop = asyncio.get_running_loop()
+        with mock.patch.object(loop, 'sendfile', side_effect=NotImplementedError):
+            await self.upload_and_check('nosendfile.bin')
+
+if __name__ == '__main__':
+    unittest.main()